@@ -1,27 +1,70 @@
 '''Functions for creating a Text User Interface'''
 
-from typing import Any, Callable, Collection, Optional, List
+import bisect
+import sys
+from typing import Any, Callable, Collection, Dict, Optional, List, Protocol, Sequence
+
+# the original `input`, to tell whether it has been replaced (e.g. in tests)
+_builtin_input = input
+
+_TAB = "    "
+_CONTINUATION_INDENT = "\n" + _TAB + _TAB
+
+_DEFAULT_END_HELP = "(To finish, type '..' on a line by itself and press enter.)\n"
+_EMPTY_END_HELP = "(To finish, press enter twice.)\n"
 
 def _input(prompt: str = "") -> str:
     '''
     Make sure that KeyboardInterrupts are treated as such.
     See https://stackoverflow.com/a/31131378 for more info.
     '''
+    try:
+        # make sure anything already displayed is visible before blocking, even when stdout is a pipe
+        sys.stdout.flush()
+    except ValueError:
+        # stdout has been closed
+        pass
     try:
         return input(prompt)
     except EOFError as e: # pylint: disable = invalid-name
         raise KeyboardInterrupt from e
 
+def _readline_stdin() -> str:
+    '''
+    Read a line straight from stdin, skipping the overhead of `input`.
+    Meant for piped or redirected input, where `input` has no line editing to offer.
+    '''
+    line = sys.stdin.readline()
+    if not line:
+        # EOF, same as `_input`
+        raise KeyboardInterrupt
+    if line.endswith("\n"):
+        line = line[:-1]
+    return line
+
+def _is_integer(text: str) -> bool:
+    '''Whether `text` is an optional sign followed by ASCII digits, so `int` can parse it without raising'''
+    digits = text[1:] if text[:1] in ("+", "-") else text
+    return digits.isascii() and digits.isdigit()
+
+def _emit(text: str) -> None:
+    '''Write already-formatted text (including any newlines) straight to stdout'''
+    sys.stdout.write(text)
+
+def _format_multiline(human_index: int, option: str) -> str:
+    '''Format a menu line for an option that spans multiple lines, indenting the extra lines'''
+    first, _, rest = option.partition("\n")
+    return f"{_TAB}{human_index}. {first}{_CONTINUATION_INDENT}" + rest.replace("\n", _CONTINUATION_INDENT)
+
 def display(text: Any) -> None:
     '''Display text on the screen'''
     print(text)
 
 def prompt(text: str) -> str:
     '''Prompts the user for a value'''
-    if not (text.endswith(" ") or text.endswith("\n") or text.endswith("\t")):
-        # give space for the user's response
-        text += " "
-    return _input(text)
+    # give space for the user's response
+    prompt_text = text if text.endswith((" ", "\n", "\t")) else text + " "
+    return _input(prompt_text)
 
 def valid_prompt(text: str, validator: Callable[[str], bool]) -> str:
     '''
@@ -29,13 +72,19 @@ def valid_prompt(text: str, validator: Callable[[str], bool]) -> str:
     
     The validator can either return false or raise an exception in order to not accept an input.
     '''
+    # remember the validator's verdict so repeated responses aren't validated again
+    cache: Dict[str, bool] = {}
     while True:
         user_response = prompt(text)
-        try:
-            validator(user_response)
-            valid = True
-        except Exception:
-            valid = False
+        if user_response in cache:
+            valid = cache[user_response]
+        else:
+            try:
+                # only an explicit False rejects, so validators that just raise (and return None) still work
+                valid = validator(user_response) is not False
+            except Exception:
+                valid = False
+            cache[user_response] = valid
         if valid:
             return user_response
         else:
@@ -48,83 +97,135 @@ def multiline_prompt(text: str, sentinel: str = "..") -> str:
     Will notify the user of what the sentinel is.
     When the last line is the sentinel value, the prompting ends and the other text is returned.
     '''
-    if not text.endswith("\n"):
-        # give space for the user's response
-        text += "\n"
-    if sentinel:
-        end_help_text = f"(To finish, type '{sentinel}' on a line by itself and press enter.)\n"
+    if sentinel == "..":
+        end_help_text = _DEFAULT_END_HELP
+    elif not sentinel:
+        end_help_text = _EMPTY_END_HELP
     else:
-        end_help_text = f"(To finish, press enter twice.)\n"
+        end_help_text = f"(To finish, type '{sentinel}' on a line by itself and press enter.)\n"
+
+    # give space for the user's response
+    separator = "" if text.endswith("\n") else "\n"
 
-    text += end_help_text
+    prompt_text = text + separator + end_help_text
 
-    ans = ""
-    line = _input(text)
+    # Piped input can skip `input` for every line. All lines come from the same source,
+    # and a replaced `input` (e.g. in tests) is still used for all of them.
+    if input is _builtin_input and not sys.stdin.isatty():
+        _emit(prompt_text)
+        sys.stdout.flush()
+        read_line = _readline_stdin
+        line = read_line()
+    else:
+        read_line = _input
+        line = read_line(prompt_text)
+
+    lines = []
     while line != sentinel:
-        ans += line
-        ans += "\n"
-        line = _input()
+        lines.append(line)
+        line = read_line()
 
-    # take off the trailing newline
-    return ans[:-1]
+    return "\n".join(lines)
 
-def choice(options: List[str], text: Optional[str]=None) -> int:
+class ChoiceMenu(Protocol):
+    '''A prepared menu, as returned by `compile_choice`'''
+    def __call__(self, text: Optional[str] = None) -> int: ...
+
+def compile_choice(options: Sequence[str]) -> ChoiceMenu:
     '''
-    Display a list of options of what the user can do and let the user pick one.
-    Displays the text before presenting the options.
+    Prepare a menu of options once so that it can be shown to the user many times.
+    Useful for menus that are presented repeatedly, such as a main menu in a loop.
 
     Each string in `options` is an option the user can choose
 
-    Returns the (0-indexed) index of the option that was chosen.
+    Returns a function that takes the text to display before the options (or None)
+    and returns the (0-indexed) index of the option that was chosen.
     '''
     if len(options) == 0:
         raise ValueError("No options were given.")
-        
-    if text:
-        display(text)
-    display("Please choose one of the following options:")
-    for index, option in enumerate(options):
-        human_index = index + 1
-        display(f"    {human_index}. {option}")
-    display("")
 
+    options = list(options)
     if len(options) == 1:
-        display(f"There is only one option (1. {options[0]}), so it has been automatically chosen.")
-        return 0
-
-    # ask the user for choices
-    number: Optional[int] = None
-    while number is None:
-        try:
-            user_input = _input("Type the number or the option: ")
+        only_option = options[0]
+
+        def _only_choice(text: Optional[str] = None) -> int:
+            if text:
+                display(text)
+            display(f"There is only one option (1. {only_option}), so it has been automatically chosen.")
+            return 0
+
+        return _only_choice
+
+    rendered_lines = [f"{_TAB}{index + 1}. {option}" if "\n" not in option else _format_multiline(index + 1, option) for index, option in enumerate(options)]
+    menu = "Please choose one of the following options:\n" + "\n".join(rendered_lines) + "\n\n"
+
+    normalized_options = [sys.intern(option.strip().lower()) for option in options]
+    # map each normalized option to its (1-indexed) human index, keeping the first of any duplicates
+    option_index: Dict[str, int] = {}
+    for index, normalized_option in enumerate(normalized_options):
+        option_index.setdefault(normalized_option, index + 1)
+    # sorted normalized options so that prefix matches can be found with a binary search
+    sorted_options = sorted((normalized_option, index + 1) for index, normalized_option in enumerate(normalized_options))
+    sorted_keys = [normalized_option for normalized_option, _ in sorted_options]
+
+    def _choice(text: Optional[str] = None) -> int:
+        if text:
+            display(text)
+        _emit(menu)
+
+        # ask the user for choices
+        number: Optional[int] = None
+        while number is None:
             try:
-                number = int(user_input)
-            except ValueError:
-                simple_user_input = user_input.strip().lower()
-                possible_options = [index + 1 for index, option in enumerate(options) if option.strip().lower().startswith(simple_user_input)]
-                if len(possible_options) == 0:
-                    display(f"There are no options that begin with '{simple_user_input}'.")
-                    raise ValueError("Invalid start of option")
-                elif len(possible_options) == 1:
-                    number = possible_options[0]
+                user_input = _input("Type the number or the option: ")
+                stripped_input = user_input.strip()
+                if _is_integer(stripped_input):
+                    number = int(stripped_input)
                 else:
-                    display(f"There are {len(possible_options)} options that start with '{simple_user_input}':")
-                    for index in possible_options:
-                        computer_index = index - 1
-                        display(f"    {index}. {options[computer_index]}")
-                    display("Please be more specific.")
-                    raise ValueError("Unspecific option")
-
-            assert isinstance(number, int)
-            number -= 1 # adjust from human index to computer index
-            if number < 0 or len(options) <= number:
-                raise ValueError("Invalid number")
-
-        except (ValueError, AssertionError) as e:
-            display(f"Sorry, please enter a number between 1 and {len(options)} or the start of a specific option.")
-            number = None
-
-    return number
+                    simple_user_input = sys.intern(stripped_input.lower())
+                    exact_match = option_index.get(simple_user_input)
+                    if exact_match is not None:
+                        possible_options = [exact_match]
+                    else:
+                        # every option starting with the input sorts into one run beginning at `low`
+                        low = bisect.bisect_left(sorted_keys, simple_user_input)
+                        high = low
+                        while high < len(sorted_keys) and sorted_keys[high].startswith(simple_user_input):
+                            high += 1
+                        possible_options = sorted(sorted_options[i][1] for i in range(low, high))
+                    if len(possible_options) == 0:
+                        display(f"There are no options that begin with '{simple_user_input}'.")
+                        raise ValueError("Invalid start of option")
+                    elif len(possible_options) == 1:
+                        number = possible_options[0]
+                    else:
+                        display(f"There are {len(possible_options)} options that start with '{simple_user_input}':")
+                        display("\n".join(rendered_lines[index - 1] for index in possible_options))
+                        display("Please be more specific.")
+                        raise ValueError("Unspecific option")
+
+                number -= 1 # adjust from human index to computer index
+                if number < 0 or len(options) <= number:
+                    raise ValueError("Invalid number")
+
+            except ValueError as e:
+                display(f"Sorry, please enter a number between 1 and {len(options)} or the start of a specific option.")
+                number = None
+
+        return number
+
+    return _choice
+
+def choice(options: List[str], text: Optional[str]=None) -> int:
+    '''
+    Display a list of options of what the user can do and let the user pick one.
+    Displays the text before presenting the options.
+
+    Each string in `options` is an option the user can choose
+
+    Returns the (0-indexed) index of the option that was chosen.
+    '''
+    return compile_choice(options)(text)
 
 if __name__ == "__main__":
     user_response = multiline_prompt("Tell me something interesting")